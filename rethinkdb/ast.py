@@ -59,10 +59,7 @@ class Repl(object):
 
     @classmethod
     def get(cls):
-        if "repl" in cls.thread_data.__dict__:
-            return cls.thread_data.repl
-        else:
-            return None
+        return getattr(cls.thread_data, "repl", None)
 
     @classmethod
     def set(cls, conn):
@@ -71,8 +68,7 @@ class Repl(object):
 
     @classmethod
     def clear(cls):
-        if "repl" in cls.thread_data.__dict__:
-            del cls.thread_data.repl
+        cls.thread_data.__dict__.pop("repl", None)
         cls.repl_active = False
 
 
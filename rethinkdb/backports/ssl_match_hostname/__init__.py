@@ -32,15 +32,12 @@ def _dnsname_match(domain_name, hostname, max_wildcards=1):
 
     http://tools.ietf.org/html/rfc6125#section-6.4.3
     """
-    pats = []
     if not domain_name:
         return False
 
-    # Ported from python3-syntax:
-    # leftmost, *remainder = domain_name.split(r'.')
-    parts = domain_name.split(r".")
-    leftmost = parts[0]
-    remainder = parts[1:]
+    # Only the left-most label may contain wildcards, the pattern built from the
+    # other labels is cached by _wildcard_pattern
+    leftmost = domain_name.split(r".", 1)[0]
 
     wildcards = leftmost.count("*")
     if wildcards > max_wildcards:
@@ -56,6 +53,38 @@ def _dnsname_match(domain_name, hostname, max_wildcards=1):
     if not wildcards:
         return domain_name.lower() == hostname.lower()
 
+    return _wildcard_pattern(domain_name, hostname.startswith("xn--")).match(hostname)
+
+
+_MAX_WILDCARD_PATTERNS = 256
+_wildcard_patterns = {}
+
+
+def _wildcard_pattern(domain_name, idna_hostname):
+    """Get the compiled pattern of a wildcard certificate DNS name. Connections
+    verify the same few certificate names over and over, so the compiled
+    patterns are cached.
+    """
+    key = (domain_name, idna_hostname)
+    pattern = _wildcard_patterns.get(key)
+
+    if pattern is None:
+        if len(_wildcard_patterns) >= _MAX_WILDCARD_PATTERNS:
+            _wildcard_patterns.clear()
+
+        pattern = _wildcard_patterns[key] = _compile_wildcard_pattern(
+            domain_name, idna_hostname
+        )
+
+    return pattern
+
+
+def _compile_wildcard_pattern(domain_name, idna_hostname):
+    pats = []
+    parts = domain_name.split(r".")
+    leftmost = parts[0]
+    remainder = parts[1:]
+
     # RFC 6125, section 6.4.3, subitem 1.
     # The client SHOULD NOT attempt to match a presented identifier in which
     # the wildcard character comprises a label other than the left-most label.
@@ -63,7 +92,7 @@ def _dnsname_match(domain_name, hostname, max_wildcards=1):
         # When '*' is a fragment by itself, it matches a non-empty dotless
         # fragment.
         pats.append("[^.]+")
-    elif leftmost.startswith("xn--") or hostname.startswith("xn--"):
+    elif leftmost.startswith("xn--") or idna_hostname:
         # RFC 6125, section 6.4.3, subitem 3.
         # The client SHOULD NOT attempt to match a presented identifier
         # where the wildcard character is embedded within an A-label or
@@ -77,8 +106,7 @@ def _dnsname_match(domain_name, hostname, max_wildcards=1):
     for frag in remainder:
         pats.append(re.escape(frag))
 
-    pat = re.compile(r"\A" + r"\.".join(pats) + r"\Z", re.IGNORECASE)
-    return pat.match(hostname)
+    return re.compile(r"\A" + r"\.".join(pats) + r"\Z", re.IGNORECASE)
 
 
 def match_hostname(cert, hostname):
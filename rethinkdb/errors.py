@@ -92,10 +92,18 @@ class ReqlError(Exception):
         super(ReqlError, self).__init__(message)
         self.message = message
         self.frames = frames
+        self._formatted_message = None
         if term is not None and frames is not None:
             self.query_printer = QueryPrinter(term, self.frames)
 
     def __str__(self):
+        # Printing the query is expensive, format the message only once
+        if self._formatted_message is None:
+            self._formatted_message = self._format_message()
+
+        return self._formatted_message
+
+    def _format_message(self):
         if self.frames is None:
             return convertForPrint(self.message)
         else:
@@ -181,19 +189,23 @@ RqlClientError = ReqlDriverError
 RqlDriverError = ReqlDriverError
 
 
+def _connection_error_message(msg, host, port):
+    if host is None or port is None:
+        return msg
+
+    return "Could not connect to {}:{}, {}".format(host, port, msg)
+
+
 class ReqlAuthError(ReqlDriverError):
     def __init__(self, msg, host=None, port=None):
-        if host is not None and port is not None:
-            msg = "Could not connect to {}:{}, {}".format(host, port, msg)
-        super(ReqlAuthError, self).__init__(msg)
+        super(ReqlAuthError, self).__init__(_connection_error_message(msg, host, port))
 
 
 class _ReqlTimeoutError(ReqlDriverError):
     def __init__(self, host=None, port=None):
-        msg = "Operation timed out."
-        if host is not None and port is not None:
-            msg = "Could not connect to {}:{}, {}".format(host, port, msg)
-        super(_ReqlTimeoutError, self).__init__(msg)
+        super(_ReqlTimeoutError, self).__init__(
+            _connection_error_message("Operation timed out.", host, port)
+        )
 
 
 try:
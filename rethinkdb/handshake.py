@@ -15,28 +15,65 @@
 # This file incorporates work covered by the following copyright:
 # Copyright 2010-2016 RethinkDB, all rights reserved.
 
-import base64
 import binascii
+import collections
 import hashlib
 import hmac
+import json
+import os
+import re
 import struct
 import sys
 import threading
-from random import SystemRandom
-
-import six
 
 from rethinkdb import ql2_pb2
 from rethinkdb.errors import ReqlAuthError, ReqlDriverError
 from rethinkdb.helpers import chain_to_bytes, decode_utf8
 from rethinkdb.logger import default_logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 try:
     xrange
 except NameError:
     xrange = range
 
 
+# Matches the "attribute=value" pairs of a SCRAM message, value may contain "="
+SCRAM_ATTRIBUTE_RE = re.compile(b"([^,=]+)=([^,]*)")
+
+# Matches the server signature of a successful authentication response which needs
+# no JSON unescaping
+SERVER_SIGNATURE_RE = re.compile(r'"authentication"\s*:\s*"v=([A-Za-z0-9+/]+=*)"')
+
+
+try:
+    int.from_bytes
+
+    def xor_digests(digest_a, digest_b):
+        return (
+            int.from_bytes(digest_a, "big") ^ int.from_bytes(digest_b, "big")
+        ).to_bytes(len(digest_a), "big")
+
+except AttributeError:
+
+    def xor_digests(digest_a, digest_b):
+        return bytes(
+            bytearray(
+                left ^ right
+                for left, right in zip(bytearray(digest_a), bytearray(digest_b))
+            )
+        )
+
+
 def compare_digest(digest_a, digest_b):
     if sys.version_info[0] == 3:
 
@@ -63,6 +100,10 @@ def compare_digest(digest_a, digest_b):
     return result == 0
 
 
+def hmac_digest(key, msg, digest):
+    return hmac.new(key, msg, digest).digest()
+
+
 def pbkdf2_hmac(hash_name, password, salt, iterations):
     if hash_name != "sha256":
         raise AssertionError(
@@ -75,17 +116,7 @@ def pbkdf2_hmac(hash_name, password, salt, iterations):
         return int(hexlify(value), 16)
 
     def to_bytes(value, unhexlify=binascii.unhexlify):
-        try:
-            return unhexlify(bytes("%064x" % value, "ascii"))
-        except TypeError:
-            return unhexlify(bytes("%064x" % value))
-
-    cache_key = (password, salt, iterations)
-
-    cache_result = HandshakeV1_0.PBKDF2_CACHE.get(cache_key)
-
-    if cache_result is not None:
-        return cache_result
+        return unhexlify("%064x" % value)
 
     mac = hmac.new(password, None, hashlib.sha256)
 
@@ -100,20 +131,39 @@ def pbkdf2_hmac(hash_name, password, salt, iterations):
         t = digest(t)
         u ^= from_bytes(t)
 
-    u = to_bytes(u)
-    HandshakeV1_0.PBKDF2_CACHE.set(cache_key, u)
-    return u
+    return to_bytes(u)
+
 
+class LRUCache(object):
+    """
+    Process wide cache which keeps the most recently used `maxsize` entries. It is
+    shared by every thread and event loop, so the connections of a pool derive the
+    salted password only once.
+    """
 
-class LocalThreadCache(threading.local):
-    def __init__(self):
-        self._cache = dict()
+    def __init__(self, maxsize=128):
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
 
+    # OrderedDict.move_to_end is not available on Python 2.7, so the entries are
+    # moved to the end by popping and inserting them again
     def set(self, key, val):
-        self._cache[key] = val
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = val
+
+            if len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
 
     def get(self, key):
-        return self._cache.get(key)
+        with self._lock:
+            val = self._cache.pop(key, None)
+
+            if val is not None:
+                self._cache[key] = val
+
+            return val
 
 
 class HandshakeV1_0(object):
@@ -132,26 +182,50 @@ class HandshakeV1_0(object):
     """
 
     VERSION = ql2_pb2.VersionDummy.Version.V1_0
+    VERSION_BYTES = struct.pack("<L", VERSION)
+    INIT_MESSAGE_TEMPLATE = (
+        b'{"protocol_version":%d,"authentication_method":"SCRAM-SHA-256",'
+        b'"authentication":"n,,n=%s,r=%s"}\0'
+    )
     PROTOCOL = ql2_pb2.VersionDummy.Protocol.JSON
-    PBKDF2_CACHE = LocalThreadCache()
+    PBKDF2_CACHE = LRUCache()
+    JSON_DECODER = json.JSONDecoder()
+    JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+    # Resolved once at import; hmac.compare_digest is available on Python 2.7.7+ and
+    # 3.3+, hashlib.pbkdf2_hmac on Python 2.7.8+ and 3.4+ and hmac.digest on Python
+    # 3.7+, otherwise our own implementations are used.
+    _compare_digest = staticmethod(getattr(hmac, "compare_digest", compare_digest))
+    _pbkdf2_hmac = staticmethod(getattr(hashlib, "pbkdf2_hmac", pbkdf2_hmac))
+    _hmac_digest = staticmethod(getattr(hmac, "digest", hmac_digest))
 
     def __init__(self, json_decoder, json_encoder, host, port, username, password):
         """
         TODO:
         """
 
-        self._json_decoder = json_decoder
-        self._json_encoder = json_encoder
+        # The handshake messages are plain JSON, so the shared instances are used
+        # unless the caller provides its own decoder or encoder.
+        self._json_decoder = (
+            json_decoder if json_decoder is not None else self.JSON_DECODER
+        )
+        self._json_encoder = (
+            json_encoder if json_encoder is not None else self.JSON_ENCODER
+        )
         self._host = host
         self._port = port
         self._username = (
             username.encode("utf-8").replace(b"=", b"=3D").replace(b",", b"=2C")
         )
+        # The username as it is embedded into the JSON of the initial message
+        self._json_username = (
+            self._json_encoder.encode(username)
+            .encode("utf-8")[1:-1]
+            .replace(b"=", b"=3D")
+            .replace(b",", b"=2C")
+        )
 
-        self._password = six.b(password)
-
-        self._compare_digest = self._get_compare_digest()
-        self._pbkdf2_hmac = self._get_pbkdf2_hmac()
+        self._password = chain_to_bytes(password)
 
         self._protocol_version = 0
         self._random_nonce = None
@@ -159,26 +233,6 @@ class HandshakeV1_0(object):
         self._server_signature = None
         self._state = 0
 
-    @staticmethod
-    def _get_compare_digest():
-        """
-        Get the compare_digest function from hashlib if package contains it, else get
-        our own function. Please note that hashlib contains this function only for
-        Python 2.7.7+ and 3.3+.
-        """
-
-        return getattr(hmac, "compare_digest", compare_digest)
-
-    @staticmethod
-    def _get_pbkdf2_hmac():
-        """
-        Get the pbkdf2_hmac function from hashlib if package contains it, else get
-        our own function. Please note that hashlib contains this function only for
-        Python 2.7.8+ and 3.4+.
-        """
-
-        return getattr(hashlib, "pbkdf2_hmac", pbkdf2_hmac)
-
     @staticmethod
     def _get_authentication_and_first_client_message(response):
         """
@@ -190,9 +244,7 @@ class HandshakeV1_0(object):
         """
 
         first_client_message = response["authentication"].encode("ascii")
-        authentication = dict(
-            x.split(b"=", 1) for x in first_client_message.split(b",")
-        )
+        authentication = dict(SCRAM_ATTRIBUTE_RE.findall(first_client_message))
         return first_client_message, authentication
 
     def _next_state(self):
@@ -202,20 +254,61 @@ class HandshakeV1_0(object):
 
         self._state += 1
 
+    def _get_salted_password(self, salt, iterations):
+        """
+        Get the salted password for the given salt and iteration count. The result of
+        the key stretching is cached, so reconnecting with the same credentials does
+        not have to run PBKDF2 again.
+
+        :param salt: Salt sent by the server
+        :param iterations: Iteration count sent by the server
+        :return: Salted password
+        """
+
+        cache_key = (self._password, salt, iterations)
+        salted_password = self.PBKDF2_CACHE.get(cache_key)
+
+        if salted_password is None:
+            salted_password = self._pbkdf2_hmac(
+                "sha256", self._password, salt, iterations
+            )
+            self.PBKDF2_CACHE.set(cache_key, salted_password)
+
+        return salted_password
+
+    def _decode_json(self, value):
+        """
+        Get the decoded value of the JSON string. If orjson is installed and no custom
+        decoder was given, orjson is used to parse the string.
+
+        :param value: JSON string to decode
+        :return: Decoded value
+        """
+
+        if orjson is not None and self._json_decoder is self.JSON_DECODER:
+            return orjson.loads(value)
+
+        return self._json_decoder.decode(value)
+
     def _decode_json_response(self, response, with_utf8=False):
         """
         Get decoded json response from response.
 
         :param response: Response from the database
         :param with_utf8: UTF-8 decode response before json decoding
-        :raises: ReqlDriverError | ReqlAuthError
+        :raises: ReqlDriverError | ReqlAuthError | ValueError
         :return: Json decoded response of the original response
         """
 
         if with_utf8:
             response = decode_utf8(response)
 
-        json_response = self._json_decoder.decode(response)
+        # The server answers with a plain "ERROR: ..." string instead of JSON if it
+        # could not process the message, which is cheaper to detect than to parse
+        if response.startswith("ERROR"):
+            raise ValueError(response)
+
+        json_response = self._decode_json(response)
 
         if not json_response.get("success"):
             if 10 <= json_response["error_code"] <= 20:
@@ -238,26 +331,19 @@ class HandshakeV1_0(object):
         if response is not None:
             raise ReqlDriverError("Unexpected response")
 
-        self._random_nonce = base64.standard_b64encode(
-            bytes(bytearray(SystemRandom().getrandbits(8) for i in range(18)))
-        )
+        # 18 random bytes encode to exactly 24 base64 characters without padding
+        self._random_nonce = base64.b64encode(os.urandom(18))
 
-        self._first_client_message = chain_to_bytes(
-            "n=", self._username, ",r=", self._random_nonce
+        # The username is stored escaped and encoded, so all the pieces are bytes
+        # and can be joined without going through chain_to_bytes
+        self._first_client_message = b"".join(
+            (b"n=", self._username, b",r=", self._random_nonce)
         )
 
-        initial_message = chain_to_bytes(
-            struct.pack("<L", self.VERSION),
-            self._json_encoder.encode(
-                {
-                    "protocol_version": self._protocol_version,
-                    "authentication_method": "SCRAM-SHA-256",
-                    "authentication": chain_to_bytes(
-                        "n,,", self._first_client_message
-                    ).decode("ascii"),
-                }
-            ).encode("utf-8"),
-            b"\0",
+        initial_message = self.VERSION_BYTES + self.INIT_MESSAGE_TEMPLATE % (
+            self._protocol_version,
+            self._json_username,
+            self._random_nonce,
         )
 
         self._next_state()
@@ -270,7 +356,7 @@ class HandshakeV1_0(object):
         message.
 
         :param response: Response from the database
-        :raises: ReqlDriverError | ReqlAuthError
+        :raises: ReqlDriverError | ReqlAuthError | ValueError
         :return: An empty string
         """
 
@@ -306,54 +392,50 @@ class HandshakeV1_0(object):
         ) = self._get_authentication_and_first_client_message(json_response)
 
         random_nonce = authentication[b"r"]
-        if not random_nonce.startswith(self._random_nonce):
+        # The nonce is embedded into the authentication request as is, so it must
+        # not contain characters that would need escaping in a JSON string
+        if (
+            not random_nonce.startswith(self._random_nonce)
+            or b'"' in random_nonce
+            or b"\\" in random_nonce
+        ):
             raise ReqlAuthError("Invalid nonce from server", self._host, self._port)
 
-        salted_password = self._pbkdf2_hmac(
-            "sha256",
-            self._password,
+        salted_password = self._get_salted_password(
             base64.standard_b64decode(authentication[b"s"]),
             int(authentication[b"i"]),
         )
 
-        message_without_proof = chain_to_bytes("c=biws,r=", random_nonce)
+        message_without_proof = b"c=biws,r=" + random_nonce
         auth_message = b",".join(
             (self._first_client_message, first_client_message, message_without_proof)
         )
 
-        self._server_signature = hmac.new(
-            hmac.new(salted_password, b"Server Key", hashlib.sha256).digest(),
+        self._server_signature = self._hmac_digest(
+            self._hmac_digest(salted_password, b"Server Key", hashlib.sha256),
             auth_message,
             hashlib.sha256,
-        ).digest()
+        )
 
-        client_key = hmac.new(salted_password, b"Client Key", hashlib.sha256).digest()
-        client_signature = hmac.new(
+        client_key = self._hmac_digest(salted_password, b"Client Key", hashlib.sha256)
+        client_signature = self._hmac_digest(
             hashlib.sha256(client_key).digest(), auth_message, hashlib.sha256
-        ).digest()
-        client_proof = struct.pack(
-            "32B",
-            *(
-                l ^ random_nonce
-                for l, random_nonce in zip(
-                    struct.unpack("32B", client_key),
-                    struct.unpack("32B", client_signature),
-                )
+        )
+        client_proof = xor_digests(client_key, client_signature)
+
+        authentication_request = b"".join(
+            (
+                b'{"authentication":"',
+                message_without_proof,
+                b",p=",
+                base64.b64encode(client_proof),
+                b'"}\0',
             )
         )
 
-        authentication_request = chain_to_bytes(
-            self._json_encoder.encode(
-                {
-                    "authentication": chain_to_bytes(
-                        message_without_proof,
-                        ",p=",
-                        base64.standard_b64encode(client_proof),
-                    ).decode("ascii")
-                }
-            ),
-            b"\0",
-        )
+        # Only the server signature is needed from now on
+        self._random_nonce = None
+        self._first_client_message = None
 
         self._next_state()
         return authentication_request
@@ -368,14 +450,22 @@ class HandshakeV1_0(object):
         :return: None
         """
 
-        json_response = self._decode_json_response(response, with_utf8=True)
+        response = decode_utf8(response)
+        match = SERVER_SIGNATURE_RE.search(response)
 
-        (
-            first_client_message,
-            authentication,
-        ) = self._get_authentication_and_first_client_message(json_response)
-        server_signature = base64.standard_b64decode(authentication[b"v"])
+        if match is not None:
+            server_signature = base64.standard_b64decode(match.group(1))
+        else:
+            json_response = self._decode_json_response(response)
+
+            (
+                first_client_message,
+                authentication,
+            ) = self._get_authentication_and_first_client_message(json_response)
+            server_signature = base64.standard_b64decode(authentication[b"v"])
 
+        # The signature is secret derived data, it has to be compared in constant time
+        # to not leak timing information. Do not replace this with "==".
         if not self._compare_digest(server_signature, self._server_signature):
             raise ReqlAuthError("Invalid server signature", self._host, self._port)
 
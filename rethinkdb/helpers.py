@@ -1,17 +1,17 @@
-import six
+try:
+    unicode
+except NameError:
+    unicode = str
 
 
 def decode_utf8(string, encoding="utf-8"):
-    if hasattr(string, "decode"):
-        return string.decode(encoding)
-
-    return string
+    return string if type(string) is unicode else string.decode(encoding)
 
 
 def chain_to_bytes(*strings):
     return b"".join(
         [
-            six.b(string) if isinstance(string, six.string_types) else string
+            string.encode("latin-1") if type(string) is unicode else string
             for string in strings
         ]
     )
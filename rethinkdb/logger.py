@@ -54,60 +54,74 @@ class DriverLogger(object):
 
         return str(message)
 
-    def _print_message(self, level, message):
+    def _print_message(self, level, message, *args):
         if self.write_to_console:
+            if args:
+                message = message % args
+
             if level <= logging.WARNING:
                 sys.stdout.write(message)
             else:
                 sys.stderr.write(message)
 
     def _log(self, level, message, *args, **kwargs):
-        self._print_message(level, message)
+        if not self.write_to_console and not self.logger.isEnabledFor(level):
+            return
+
+        self._print_message(level, message, *args)
         self.logger.log(level, message, *args, **kwargs)
 
-    def debug(self, message):
+    def debug(self, message, *args):
         """
-        Log debug messages.
+        Log debug messages. The message is merged with the args only if it is
+        emitted.
 
         :param message: Debug message
         :type message: str
+        :param args: Arguments merged into the message using the %-operator
         :rtype: None
         """
 
-        self._log(logging.DEBUG, message)
+        self._log(logging.DEBUG, message, *args)
 
-    def info(self, message):
+    def info(self, message, *args):
         """
-        Log info messages.
+        Log info messages. The message is merged with the args only if it is
+        emitted.
 
         :param message: Info message
         :type message: str
+        :param args: Arguments merged into the message using the %-operator
         :rtype: None
         """
 
-        self._log(logging.INFO, message)
+        self._log(logging.INFO, message, *args)
 
-    def warning(self, message):
+    def warning(self, message, *args):
         """
-        Log warning messages.
+        Log warning messages. The message is merged with the args only if it is
+        emitted.
 
         :param message: Warning message
         :type message: str
+        :param args: Arguments merged into the message using the %-operator
         :rtype: None
         """
 
-        self._log(logging.WARNING, message)
+        self._log(logging.WARNING, message, *args)
 
-    def error(self, message):
+    def error(self, message, *args):
         """
-        Log error messages.
+        Log error messages. The message is merged with the args only if it is
+        emitted.
 
         :param message: Error message
         :type message: str
+        :param args: Arguments merged into the message using the %-operator
         :rtype: None
         """
 
-        self._log(logging.ERROR, message)
+        self._log(logging.ERROR, message, *args)
 
     def exception(self, exc, with_raise=False):
         """
@@ -669,9 +669,11 @@ class Connection(object):
         if _handshake_version == 4:
             raise NotImplementedError("The v0.4 handshake was removed.")
 
+        # The handshake only exchanges plain JSON, so it uses the shared
+        # encoder and decoder instead of building ReQL ones per connection
         self.handshake = HandshakeV1_0(
-            self._json_decoder(),
-            self._json_encoder(),
+            None,
+            None,
             self.host,
             self.port,
             user,
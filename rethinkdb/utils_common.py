@@ -171,92 +171,135 @@ def check_minimum_version(options, minimum_version="1.6", raise_exception=True):
 
 DbTable = collections.namedtuple("DbTable", ["db", "table"])
 _tableNameRegex = re.compile(r"^(?P<db>[\w-]+)(\.(?P<table>[\w-]+))?$")
+_positiveIntRegex = re.compile(r"^0*[1-9][0-9]*$")
 
 
-class CommonOptionsParser(optparse.OptionParser, object):
+# -- Type Checkers
 
-    __retryQuery = None
-    __connectRegex = re.compile(r"^\s*(?P<hostname>[\w.-]+)(:(?P<port>\d+))?\s*$")
 
-    def format_epilog(self, formatter):
-        return self.epilog or ""
+def check_tls_option(_, opt_str, value):
+    value = str(value)
 
-    def __init__(self, *args, **kwargs):
-        # -- Type Checkers
+    if os.path.isfile(value):
+        return {"ca_certs": os.path.realpath(value)}
+    else:
+        raise optparse.OptionValueError(
+            "Option %s value is not a file: %r" % (opt_str, value)
+        )
 
-        def check_tls_option(_, opt_str, value):
-            value = str(value)
 
-            if os.path.isfile(value):
-                return {"ca_certs": os.path.realpath(value)}
-            else:
-                raise optparse.OptionValueError(
-                    "Option %s value is not a file: %r" % (opt_str, value)
-                )
+def check_db_table_option(_, _opt_str, value):
+    res = _tableNameRegex.match(value)
 
-        def check_db_table_option(_, _opt_str, value):
-            res = _tableNameRegex.match(value)
+    if not res:
+        raise optparse.OptionValueError("Invalid db or db.table name: %s" % value)
 
-            if not res:
-                raise optparse.OptionValueError(
-                    "Invalid db or db.table name: %s" % value
-                )
-            if res.group("db") == "rethinkdb":
-                raise optparse.OptionValueError(
-                    "The `rethinkdb` database is special and cannot be used here"
-                )
+    db, table = res.group("db", "table")
+    if db == "rethinkdb":
+        raise optparse.OptionValueError(
+            "The `rethinkdb` database is special and cannot be used here"
+        )
 
-            return DbTable(res.group("db"), res.group("table"))
+    return DbTable(db, table)
 
-        def check_positive_int(_, opt_str, value):
-            try:
-                value = int(value)
-                if value < 1:
-                    raise ValueError
-            except ValueError:
-                raise optparse.OptionValueError(
-                    "%s value must be an integer greater than 1: %s" % (opt_str, value)
-                )
 
-            return value
+def check_positive_int(_, opt_str, value):
+    if not _positiveIntRegex.match(value):
+        raise optparse.OptionValueError(
+            "%s value must be an integer greater than 1: %s" % (opt_str, value)
+        )
 
-        def check_existing_file(_, opt_str, value):
-            if not os.path.isfile(value):
-                raise optparse.OptionValueError(
-                    "%s value was not an existing file: %s" % (opt_str, value)
-                )
+    return int(value)
 
-            return os.path.realpath(value)
 
-        def check_new_file_location(_, opt_str, value):
-            try:
-                real_value = os.path.realpath(value)
-            except Exception:
-                raise optparse.OptionValueError(
-                    "Incorrect value for %s: %s" % (opt_str, value)
-                )
+def check_existing_file(_, opt_str, value):
+    if not os.path.isfile(value):
+        raise optparse.OptionValueError(
+            "%s value was not an existing file: %s" % (opt_str, value)
+        )
 
-            if os.path.exists(real_value):
-                raise optparse.OptionValueError(
-                    "%s value already exists: %s" % (opt_str, value)
-                )
+    return os.path.realpath(value)
 
-            return real_value
 
-        def file_contents(_, opt_str, value):
-            if not os.path.isfile(value):
-                raise optparse.OptionValueError(
-                    "%s value is not an existing file: %r" % (opt_str, value)
-                )
+def check_new_file_location(_, opt_str, value):
+    try:
+        real_value = os.path.realpath(value)
+    except Exception:
+        raise optparse.OptionValueError("Incorrect value for %s: %s" % (opt_str, value))
 
-            try:
-                with open(value, "r") as passwordFile:
-                    return passwordFile.read().rstrip("\n")
-            except IOError:
-                raise optparse.OptionValueError(
-                    "bad value for %s: %s" % (opt_str, value)
-                )
+    if os.path.exists(real_value):
+        raise optparse.OptionValueError(
+            "%s value already exists: %s" % (opt_str, value)
+        )
+
+    return real_value
+
+
+def file_contents(_, opt_str, value):
+    if not os.path.isfile(value):
+        raise optparse.OptionValueError(
+            "%s value is not an existing file: %r" % (opt_str, value)
+        )
+
+    try:
+        with open(value, "r") as passwordFile:
+            return passwordFile.read().rstrip("\n")
+    except IOError:
+        raise optparse.OptionValueError("bad value for %s: %s" % (opt_str, value))
+
+
+# -- Custom Options object
+
+
+class CommonOptionChecker(optparse.Option, object):
+    TYPES = optparse.Option.TYPES + (
+        "tls_cert",
+        "db_table",
+        "pos_int",
+        "file",
+        "new_file",
+        "file_contents",
+    )
+
+    TYPE_CHECKER = copy.copy(optparse.Option.TYPE_CHECKER)
+    TYPE_CHECKER["tls_cert"] = check_tls_option
+    TYPE_CHECKER["db_table"] = check_db_table_option
+    TYPE_CHECKER["pos_int"] = check_positive_int
+    TYPE_CHECKER["file"] = check_existing_file
+    TYPE_CHECKER["new_file"] = check_new_file_location
+    TYPE_CHECKER["file_contents"] = file_contents
+
+    ACTIONS = optparse.Option.ACTIONS + ("add_key", "get_password")
+    STORE_ACTIONS = optparse.Option.STORE_ACTIONS + ("add_key", "get_password")
+    TYPED_ACTIONS = optparse.Option.TYPED_ACTIONS + ("add_key",)
+    ALWAYS_TYPED_ACTIONS = optparse.Option.ALWAYS_TYPED_ACTIONS + ("add_key",)
+
+    def take_action(self, action, dest, opt, value, values, parser):
+        if dest is None:
+            raise AssertionError("Destination can not be none")
+
+        if action == "add_key":
+            if self.metavar is None:
+                raise AssertionError("Metavar can not be none")
+
+            values.ensure_value(dest, {})[self.metavar.lower()] = value
+        elif action == "get_password":
+            values.ensure_value('password', getpass.getpass("Password for `admin`: "))
+        else:
+            super(CommonOptionChecker, self).take_action(
+                action, dest, opt, value, values, parser
+            )
+
+
+class CommonOptionsParser(optparse.OptionParser, object):
 
+    __retryQuery = None
+    __connectRegex = re.compile(r"^\s*(?P<hostname>[\w.-]+)(:(?P<port>\d+))?\s*$")
+
+    def format_epilog(self, formatter):
+        return self.epilog or ""
+
+    def __init__(self, *args, **kwargs):
         # -- Callbacks
 
         def combined_connect_action(obj, opt, value, parser, *args, **kwargs):
@@ -273,53 +316,12 @@ class CommonOptionsParser(optparse.OptionParser, object):
             if res.group("port"):
                 parser.values.driver_port = int(res.group("port"))
 
-        # -- setup custom Options object
-
-        class CommonOptionChecker(optparse.Option, object):
-            TYPES = optparse.Option.TYPES + (
-                "tls_cert",
-                "db_table",
-                "pos_int",
-                "file",
-                "new_file",
-                "file_contents",
-            )
-
-            TYPE_CHECKER = copy.copy(optparse.Option.TYPE_CHECKER)
-            TYPE_CHECKER["tls_cert"] = check_tls_option
-            TYPE_CHECKER["db_table"] = check_db_table_option
-            TYPE_CHECKER["pos_int"] = check_positive_int
-            TYPE_CHECKER["file"] = check_existing_file
-            TYPE_CHECKER["new_file"] = check_new_file_location
-            TYPE_CHECKER["file_contents"] = file_contents
-
-            ACTIONS = optparse.Option.ACTIONS + ("add_key", "get_password")
-            STORE_ACTIONS = optparse.Option.STORE_ACTIONS + ("add_key", "get_password")
-            TYPED_ACTIONS = optparse.Option.TYPED_ACTIONS + ("add_key",)
-            ALWAYS_TYPED_ACTIONS = optparse.Option.ALWAYS_TYPED_ACTIONS + ("add_key",)
-
-            def take_action(self, action, dest, opt, value, values, parser):
-                if dest is None:
-                    raise AssertionError("Destination can not be none")
-
-                if action == "add_key":
-                    if self.metavar is None:
-                        raise AssertionError("Metavar can not be none")
-
-                    values.ensure_value(dest, {})[self.metavar.lower()] = value
-                elif action == "get_password":
-                    values.ensure_value('password', getpass.getpass("Password for `admin`: "))
-                else:
-                    super(CommonOptionChecker, self).take_action(
-                        action, dest, opt, value, values, parser
-                    )
-
         kwargs["option_class"] = CommonOptionChecker
 
         # - default description to the module's __doc__
         if "description" not in kwargs:
-            # get calling module
-            caller = inspect.getmodule(inspect.stack()[1][0])
+            # get calling module, without building the whole inspect.stack()
+            caller = inspect.getmodule(sys._getframe(1))
             if caller.__doc__:
                 kwargs["description"] = caller.__doc__
 
@@ -0,0 +1,84 @@
+import pytest
+from mock import patch
+
+from rethinkdb.errors import ReqlAuthError, ReqlError, ReqlTimeoutError
+
+
+class FakeTerm(object):
+    def __init__(self, name, args=(), optargs=None):
+        self.name = name
+        self._args = list(args)
+        self.optargs = optargs or {}
+
+    def compose(self, args, optargs):
+        if not args:
+            return self.name
+
+        return "%s(%s)" % (self.name, ", ".join("".join(arg) for arg in args))
+
+
+@pytest.mark.unit
+class TestReqlError(object):
+    def setup_method(self):
+        self.term = FakeTerm("add", [FakeTerm("1"), FakeTerm("'a'")])
+
+    def test_message(self):
+        error = ReqlError("Error message.")
+
+        assert error.message == "Error message."
+        assert error.frames is None
+        assert str(error) == "Error message."
+
+    def test_reql_error_terms_and_frames_are_set(self):
+        error = ReqlError("Error message.", term=self.term, frames=[1])
+
+        assert error.frames == [1]
+        assert error.query_printer.root is self.term
+        assert str(error) == "Error message in:\nadd(1, 'a')\n       ^^^ "
+
+    def test_repr(self):
+        error = ReqlError("Error message.", term=self.term, frames=[1])
+
+        assert repr(error) == "<ReqlError instance: %s >" % str(error)
+
+    def test_str_is_formatted_once(self):
+        error = ReqlError("Error message.", term=self.term, frames=[1])
+
+        with patch.object(
+            error.query_printer, "print_query", wraps=error.query_printer.print_query
+        ) as mock_print_query:
+            str(error)
+            repr(error)
+
+        assert mock_print_query.call_count == 1
+
+
+@pytest.mark.unit
+class TestConnectionErrors(object):
+    def test_auth_error(self):
+        error = ReqlAuthError("Wrong password")
+
+        assert error.message == "Wrong password"
+
+    def test_auth_error_with_host_and_port(self):
+        error = ReqlAuthError("Wrong password", "localhost", 28015)
+
+        assert error.message == "Could not connect to localhost:28015, Wrong password"
+
+    def test_timeout_error(self):
+        error = ReqlTimeoutError()
+
+        assert error.message == "Operation timed out."
+
+    def test_timeout_error_with_host_and_port(self):
+        error = ReqlTimeoutError("localhost", 28015)
+
+        assert (
+            error.message
+            == "Could not connect to localhost:28015, Operation timed out."
+        )
+
+    def test_timeout_error_only_host(self):
+        error = ReqlTimeoutError(host="localhost")
+
+        assert error.message == "Operation timed out."
@@ -1,21 +1,37 @@
 import base64
+import hashlib
+import hmac
 import json
 import struct
+import threading
 
 import pytest
-import six
 from mock import ANY, Mock, call, patch
 
 from rethinkdb.errors import ReqlAuthError, ReqlDriverError
-from rethinkdb.handshake import HandshakeV1_0, LocalThreadCache
+from rethinkdb.handshake import (
+    HandshakeV1_0,
+    LRUCache,
+    compare_digest,
+    hmac_digest,
+    pbkdf2_hmac,
+    xor_digests,
+)
 from rethinkdb.helpers import chain_to_bytes
 from rethinkdb.ql2_pb2 import VersionDummy
 
+# Responses as they are received from the server
+SUCCESS_RESPONSE = b'{"success":true}'
+PROTOCOL_VERSION_RESPONSE = (
+    b'{"success":true,"min_protocol_version":0,"max_protocol_version":1}'
+)
+AUTH_RESPONSE = b'{"success":true,"authentication":"v=c2lnbmF0dXJl"}'
+
 
 @pytest.mark.unit
-class TestLocalThreadCache(object):
+class TestLRUCache(object):
     def setup_method(self):
-        self.cache = LocalThreadCache()
+        self.cache = LRUCache(maxsize=2)
         self.cache_key = "test"
         self.cache_value = "cache"
 
@@ -28,12 +44,89 @@ class TestLocalThreadCache(object):
         assert self.cache._cache == {self.cache_key: self.cache_value}
 
     def test_get_from_cache(self):
-        self.cache._cache = {self.cache_key: self.cache_value}
+        self.cache.set(self.cache_key, self.cache_value)
 
         cached_value = self.cache.get(self.cache_key)
 
         assert cached_value == self.cache_value
 
+    def test_get_missing_from_cache(self):
+        assert self.cache.get(self.cache_key) is None
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("first", 1)
+        self.cache.set("second", 2)
+        self.cache.get("first")
+
+        self.cache.set("third", 3)
+
+        assert self.cache._cache == {"first": 1, "third": 3}
+
+    def test_update_moves_entry_to_end(self):
+        self.cache.set("first", 1)
+        self.cache.set("second", 2)
+        self.cache.set("first", 10)
+
+        self.cache.set("third", 3)
+
+        assert self.cache._cache == {"first": 10, "third": 3}
+
+    def test_shared_between_threads(self):
+        thread = threading.Thread(
+            target=self.cache.set, args=(self.cache_key, self.cache_value)
+        )
+        thread.start()
+        thread.join()
+
+        assert self.cache.get(self.cache_key) == self.cache_value
+
+
+@pytest.mark.unit
+class TestXorDigests(object):
+    def test_xor_digests(self):
+        result = xor_digests(b"\x00\x0f\xf0\xff", b"\xff\x0f\x0f\x00")
+
+        assert result == b"\xff\x00\xff\xff"
+
+    def test_xor_digests_keeps_leading_zero_bytes(self):
+        result = xor_digests(b"\x01\x02", b"\x01\x02")
+
+        assert result == b"\x00\x00"
+
+
+@pytest.mark.unit
+class TestCompareDigest(object):
+    @pytest.mark.parametrize(
+        "digest,expected",
+        [(b"signature", True), (b"signaturf", False), (b"sig", False)],
+    )
+    def test_compare_digest(self, digest, expected):
+        assert compare_digest(b"signature", digest) is expected
+
+
+@pytest.mark.unit
+class TestHMACDigest(object):
+    def test_hmac_digest(self):
+        expected = hmac.new(b"key", b"message", hashlib.sha256).digest()
+
+        result = hmac_digest(b"key", b"message", hashlib.sha256)
+
+        assert result == expected
+
+
+@pytest.mark.unit
+class TestPBKDF2HMAC(object):
+    def test_pbkdf2_hmac(self):
+        expected = hashlib.pbkdf2_hmac("sha256", b"password", b"salt", 64)
+
+        result = pbkdf2_hmac("sha256", b"password", b"salt", 64)
+
+        assert result == expected
+
+    def test_pbkdf2_hmac_invalid_hash_name(self):
+        with pytest.raises(AssertionError):
+            pbkdf2_hmac("sha1", b"password", b"salt", 64)
+
 
 @pytest.mark.unit
 class TestHandshake(object):
@@ -53,63 +146,109 @@ class TestHandshake(object):
             password="",
         )
 
-    @patch("rethinkdb.handshake.HandshakeV1_0._get_pbkdf2_hmac")
-    @patch("rethinkdb.handshake.HandshakeV1_0._get_compare_digest")
-    def test_initialization(self, mock_get_compare_digest, mock_get_pbkdf2_hmac):
+    def test_initialization(self):
         handshake = self._get_handshake()
 
         assert handshake.VERSION == VersionDummy.Version.V1_0
+        assert handshake.VERSION_BYTES == struct.pack("<L", VersionDummy.Version.V1_0)
         assert handshake.PROTOCOL == VersionDummy.Protocol.JSON
-        assert mock_get_compare_digest.called is True
-        assert mock_get_pbkdf2_hmac.called is True
 
-    @patch("rethinkdb.handshake.hmac")
-    def test_get_builtin_compare_digest(self, mock_hmac):
-        mock_hmac.compare_digest = Mock
-        handshake = self._get_handshake()
+    def test_initialization_default_json_encoder_and_decoder(self):
+        handshake = HandshakeV1_0(
+            json_encoder=None,
+            json_decoder=None,
+            host="localhost",
+            port=28015,
+            username="admin",
+            password="",
+        )
 
-        assert handshake._compare_digest == mock_hmac.compare_digest
+        assert handshake._json_decoder is HandshakeV1_0.JSON_DECODER
+        assert handshake._json_encoder is HandshakeV1_0.JSON_ENCODER
 
-    @patch("rethinkdb.handshake.compare_digest")
-    @patch("rethinkdb.handshake.hmac")
-    def test_get_own_compare_digest(self, mock_hmac, mock_compare_digest):
-        delattr(mock_hmac, "compare_digest")
-        handshake = self._get_handshake()
+    @pytest.mark.parametrize(
+        "attribute,builtin",
+        [
+            ("_compare_digest", hmac.compare_digest),
+            ("_pbkdf2_hmac", hashlib.pbkdf2_hmac),
+        ],
+    )
+    def test_builtin_implementations(self, attribute, builtin):
+        assert getattr(HandshakeV1_0, attribute) is builtin
 
-        assert handshake._compare_digest == mock_compare_digest
+    @pytest.mark.skipif(
+        not hasattr(hmac, "digest"), reason="hmac.digest requires Python 3.7+"
+    )
+    def test_builtin_hmac_digest(self):
+        assert HandshakeV1_0._hmac_digest is hmac.digest
 
-    @patch("rethinkdb.handshake.hashlib")
-    def test_get_builtin_get_pbkdf2_hmac(self, mock_hashlib):
-        mock_hashlib.pbkdf2_hmac = Mock
-        handshake = self._get_handshake()
+    @patch("rethinkdb.handshake.HandshakeV1_0.PBKDF2_CACHE", new_callable=LRUCache)
+    def test_get_salted_password(self, mock_cache):
+        expected_password = b"salted"
+        self.handshake._pbkdf2_hmac = Mock(return_value=expected_password)
 
-        assert handshake._pbkdf2_hmac == mock_hashlib.pbkdf2_hmac
+        salted_password = self.handshake._get_salted_password(b"salt", 2)
 
-    @patch("rethinkdb.handshake.pbkdf2_hmac")
-    @patch("rethinkdb.handshake.hashlib")
-    def test_get_own_get_pbkdf2_hmac(self, mock_hashlib, mock_pbkdf2_hmac):
-        delattr(mock_hashlib, "pbkdf2_hmac")
-        handshake = self._get_handshake()
+        assert salted_password == expected_password
+        self.handshake._pbkdf2_hmac.assert_called_once_with("sha256", b"", b"salt", 2)
+        assert mock_cache.get((b"", b"salt", 2)) == expected_password
 
-        assert handshake._pbkdf2_hmac == mock_pbkdf2_hmac
+    @patch("rethinkdb.handshake.HandshakeV1_0.PBKDF2_CACHE", new_callable=LRUCache)
+    def test_get_salted_password_cached(self, mock_cache):
+        expected_password = b"salted"
+        mock_cache.set((b"", b"salt", 2), expected_password)
+        self.handshake._pbkdf2_hmac = Mock()
 
-    def test_decode_json_response(self):
-        expected_response = {"success": True}
+        salted_password = self.handshake._get_salted_password(b"salt", 2)
 
-        decoded_response = self.handshake._decode_json_response(
-            json.dumps(expected_response)
-        )
+        assert salted_password == expected_password
+        assert self.handshake._pbkdf2_hmac.called is False
 
-        assert decoded_response == expected_response
+    def test_get_authentication_and_first_client_message(self):
+        response = {"authentication": "r=bm9uY2U=,s=c2FsdA==,i=4096"}
 
-    def test_decode_json_response_utf8_encoded(self):
-        expected_response = {"success": True}
+        (
+            first_client_message,
+            authentication,
+        ) = self.handshake._get_authentication_and_first_client_message(response)
+
+        assert first_client_message == b"r=bm9uY2U=,s=c2FsdA==,i=4096"
+        assert authentication == {b"r": b"bm9uY2U=", b"s": b"c2FsdA==", b"i": b"4096"}
 
+    def test_decode_json(self):
+        result = self.handshake._decode_json('{"success": true}')
+
+        assert result == {"success": True}
+
+    @patch("rethinkdb.handshake.orjson")
+    def test_decode_json_orjson(self, mock_orjson):
+        mock_orjson.loads.return_value = {"success": True}
+        self.handshake._json_decoder = HandshakeV1_0.JSON_DECODER
+
+        result = self.handshake._decode_json('{"success":true}')
+
+        assert result == {"success": True}
+        mock_orjson.loads.assert_called_once_with('{"success":true}')
+
+    @patch("rethinkdb.handshake.orjson", None)
+    def test_decode_json_without_orjson(self):
+        self.handshake._json_decoder = HandshakeV1_0.JSON_DECODER
+
+        result = self.handshake._decode_json('{"success":true}')
+
+        assert result == {"success": True}
+
+    def test_decode_json_response(self):
         decoded_response = self.handshake._decode_json_response(
-            json.dumps(expected_response), True
+            SUCCESS_RESPONSE.decode("utf-8")
         )
 
-        assert decoded_response == expected_response
+        assert decoded_response == {"success": True}
+
+    def test_decode_json_response_utf8_encoded(self):
+        decoded_response = self.handshake._decode_json_response(SUCCESS_RESPONSE, True)
+
+        assert decoded_response == {"success": True}
 
     def test_decode_json_response_auth_error(self):
         expected_response = {
@@ -135,6 +274,16 @@ class TestHandshake(object):
                 json.dumps(expected_response)
             )
 
+    def test_decode_json_response_error_received(self):
+        self.handshake._json_decoder = Mock()
+
+        with pytest.raises(ValueError, match="ERROR: unexpected message"):
+            decoded_response = self.handshake._decode_json_response(
+                b"ERROR: unexpected message", True
+            )
+
+        assert self.handshake._json_decoder.decode.called is False
+
     def test_next_state(self):
         previous_state = self.handshake._state
         self.handshake._next_state()
@@ -144,10 +293,10 @@ class TestHandshake(object):
         assert new_state == 1
 
     def test_reset(self):
-        self.handshake._random_nonce = Mock()
-        self.handshake._first_client_message = Mock()
-        self.handshake._server_signature = Mock()
-        self.handshake._state = Mock()
+        self.handshake._random_nonce = b"nonce"
+        self.handshake._first_client_message = b"first"
+        self.handshake._server_signature = b"sig"
+        self.handshake._state = 2
 
         self.handshake.reset()
 
@@ -159,48 +308,72 @@ class TestHandshake(object):
     @patch("rethinkdb.handshake.base64")
     def test_init_connection(self, mock_base64):
         self.handshake._next_state = Mock()
-        encoded_string = "test"
-        mock_base64.standard_b64encode.return_value = encoded_string
-        first_client_message = chain_to_bytes(
-            "n=", self.handshake._username, ",r=", encoded_string
-        )
+        mock_base64.b64encode.return_value = b"test"
 
-        expected_result = chain_to_bytes(
-            struct.pack("<L", self.handshake.VERSION),
-            self.handshake._json_encoder.encode(
-                {
-                    "protocol_version": self.handshake._protocol_version,
-                    "authentication_method": "SCRAM-SHA-256",
-                    "authentication": chain_to_bytes(
-                        "n,,", first_client_message
-                    ).decode("ascii"),
-                }
-            ).encode("utf-8"),
-            b"\0",
+        expected_result = struct.pack("<L", self.handshake.VERSION) + (
+            b'{"protocol_version":0,"authentication_method":"SCRAM-SHA-256",'
+            b'"authentication":"n,,n=admin,r=test"}\x00'
         )
 
         result = self.handshake._init_connection(response=None)
 
         assert result == expected_result
+        assert self.handshake._first_client_message == b"n=admin,r=test"
         assert self.handshake._next_state.called is True
 
+    @patch("rethinkdb.handshake.base64")
+    def test_init_connection_escaped_username(self, mock_base64):
+        mock_base64.b64encode.return_value = b"test"
+        handshake = HandshakeV1_0(
+            json_encoder=self.encoder,
+            json_decoder=self.decoder,
+            host="localhost",
+            port=28015,
+            username='ad"m,in',
+            password="",
+        )
+
+        result = handshake._init_connection(response=None)
+
+        assert json.loads(result[4:-1])["authentication"] == 'n,,n=ad"m=2Cin,r=test'
+        assert handshake._first_client_message == b'n=ad"m=2Cin,r=test'
+
+    def test_init_connection_random_nonce(self):
+        self.handshake._init_connection(response=None)
+
+        assert len(self.handshake._random_nonce) == 24
+        assert not self.handshake._random_nonce.endswith(b"=")
+
+    @patch("rethinkdb.handshake.base64")
+    def test_init_connection_non_ascii_username(self, mock_base64):
+        mock_base64.b64encode.return_value = b"test"
+        handshake = HandshakeV1_0(
+            json_encoder=None,
+            json_decoder=None,
+            host="localhost",
+            port=28015,
+            username="g\xe1bor",
+            password="",
+        )
+
+        result = handshake._init_connection(response=None)
+
+        assert b'"authentication":"n,,n=g\xc3\xa1bor,r=test"' in result
+        assert handshake._first_client_message == b"n=g\xc3\xa1bor,r=test"
+
     def test_init_connection_unexpected_response(self):
         self.handshake._next_state = Mock()
 
         with pytest.raises(ReqlDriverError):
-            result = self.handshake._init_connection(response=Mock())
+            result = self.handshake._init_connection(response=b"unexpected")
 
         assert self.handshake._next_state.called is False
 
     def test_read_response(self):
         self.handshake._next_state = Mock()
-        response = {
-            "success": True,
-            "min_protocol_version": 0,
-            "max_protocol_version": 1,
-        }
-
-        result = self.handshake._read_response(json.dumps(response))
+        result = self.handshake._read_response(
+            PROTOCOL_VERSION_RESPONSE.decode("utf-8")
+        )
 
         assert result == ""
         assert self.handshake._next_state.called is True
@@ -213,6 +386,18 @@ class TestHandshake(object):
 
         assert self.handshake._next_state.called is False
 
+    def test_read_response_error_message_received(self):
+        self.handshake._next_state = Mock()
+        self.handshake._json_decoder = Mock()
+
+        with pytest.raises(ValueError, match="ERROR: received an unsupported"):
+            result = self.handshake._read_response(
+                "ERROR: received an unsupported protocol version"
+            )
+
+        assert self.handshake._json_decoder.decode.called is False
+        assert self.handshake._next_state.called is False
+
     def test_read_response_protocol_mismatch(self):
         self.handshake._next_state = Mock()
         response = {
@@ -228,37 +413,43 @@ class TestHandshake(object):
 
     def test_prepare_auth_request(self):
         self.handshake._next_state = Mock()
-        self.handshake._random_nonce = (
-            base64.encodebytes(b"random_nonce")
-            if six.PY3
-            else base64.b64encode(b"random_nonce")
-        )
+        self.handshake._random_nonce = base64.b64encode(b"random_nonce")
         self.handshake._first_client_message = chain_to_bytes(
             "n=", self.handshake._username, ",r=", self.handshake._random_nonce
         )
         response = {
             "success": True,
-            "authentication": "s=cmFuZG9tX25vbmNl\n,i=2,r=cmFuZG9tX25vbmNl\n",
+            "authentication": "s=cmFuZG9tX25vbmNl,i=2,r=cmFuZG9tX25vbmNl",
         }
-        if six.PY3:
-            expected_result = b'{"authentication": "c=biws,r=cmFuZG9tX25vbmNl\\n,p=2Tpd60LM4Tkhe7VATTPj/lh4yunl07Sm4A+m3ukC774="}\x00'
-        else:
-            expected_result = b'{"authentication": "c=biws,r=cmFuZG9tX25vbmNl\\n,p=JqVP98bzu3yye/3SLopNJvCRimBx34uKI/EY8UI41gM="}\x00'
+        expected_result = b'{"authentication":"c=biws,r=cmFuZG9tX25vbmNl,p=9AvtHf+uzTwXnpH+iE6QH2WHZDHNN1wtiN99FA4cJTE="}\x00'
 
         result = self.handshake._prepare_auth_request(json.dumps(response))
 
-        assert isinstance(result, six.binary_type)
+        assert isinstance(result, bytes)
         assert result == expected_result
+        assert self.handshake._random_nonce is None
+        assert self.handshake._first_client_message is None
         assert self.handshake._next_state.called is True
 
     def test_prepare_auth_request_invalid_nonce(self):
         self.handshake._next_state = Mock()
-        self.handshake._random_nonce = (
-            base64.encodebytes(b"invalid") if six.PY3 else base64.b64encode(b"invalid")
-        )
+        self.handshake._random_nonce = base64.b64encode(b"invalid")
+        response = {
+            "success": True,
+            "authentication": "s=fake,i=2,r=cmFuZG9tX25vbmNl",
+        }
+
+        with pytest.raises(ReqlAuthError):
+            result = self.handshake._prepare_auth_request(json.dumps(response))
+
+        assert self.handshake._next_state.called is False
+
+    def test_prepare_auth_request_nonce_needs_escaping(self):
+        self.handshake._next_state = Mock()
+        self.handshake._random_nonce = base64.b64encode(b"random_nonce")
         response = {
             "success": True,
-            "authentication": "s=fake,i=2,r=cmFuZG9tX25vbmNl\n",
+            "authentication": 's=fake,i=2,r=cmFuZG9tX25vbmNl"',
         }
 
         with pytest.raises(ReqlAuthError):
@@ -267,6 +458,14 @@ class TestHandshake(object):
         assert self.handshake._next_state.called is False
 
     def test_read_auth_response(self):
+        self.handshake._next_state = Mock()
+        self.handshake._server_signature = b"signature"
+        result = self.handshake._read_auth_response(AUTH_RESPONSE.decode("utf-8"))
+
+        assert result is None
+        assert self.handshake._next_state.called is True
+
+    def test_read_auth_response_escaped_signature(self):
         self.handshake._next_state = Mock()
         self.handshake._server_signature = b"signature"
         response = {"success": True, "authentication": "v=c2lnbmF0dXJl\n"}
@@ -276,12 +475,58 @@ class TestHandshake(object):
         assert result is None
         assert self.handshake._next_state.called is True
 
-    def test_read_auth_response_invalid_server_signature(self):
+    def test_read_auth_response_skips_json_decoding(self):
         self.handshake._next_state = Mock()
-        self.handshake._server_signature = b"invalid-signature"
-        response = {"success": True, "authentication": "v=c2lnbmF0dXJl\n"}
+        self.handshake._json_decoder = Mock()
+        self.handshake._server_signature = b"signature"
+
+        result = self.handshake._read_auth_response(AUTH_RESPONSE)
+
+        assert result is None
+        assert self.handshake._json_decoder.decode.called is False
+        assert self.handshake._next_state.called is True
+
+    def test_read_auth_response_error(self):
+        self.handshake._next_state = Mock()
+        self.handshake._server_signature = b"signature"
+        response = {
+            "success": False,
+            "error_code": 12,
+            "error": 'Wrong "authentication":"v=c2lnbmF0dXJl"',
+        }
 
         with pytest.raises(ReqlAuthError):
             result = self.handshake._read_auth_response(json.dumps(response))
 
         assert self.handshake._next_state.called is False
+
+    def test_read_auth_response_invalid_server_signature(self):
+        self.handshake._next_state = Mock()
+        self.handshake._server_signature = b"invalid-signature"
+        with pytest.raises(ReqlAuthError):
+            result = self.handshake._read_auth_response(AUTH_RESPONSE)
+
+        assert self.handshake._next_state.called is False
+
+    def test_next_message(self):
+        result = self.handshake.next_message(None)
+
+        assert isinstance(result, bytes)
+        assert self.handshake._state == 1
+
+    def test_next_message_replaced_handler(self):
+        self.handshake._state = 1
+        self.handshake._read_response = Mock(return_value="")
+
+        result = self.handshake.next_message(PROTOCOL_VERSION_RESPONSE)
+
+        assert result == ""
+        self.handshake._read_response.assert_called_once_with(
+            PROTOCOL_VERSION_RESPONSE.decode("utf-8")
+        )
+
+    def test_next_message_unexpected_state(self):
+        self.handshake._state = 4
+
+        with pytest.raises(ReqlDriverError):
+            self.handshake.next_message(None)
@@ -1,46 +1,36 @@
 import pytest
-from mock import Mock
 
 from rethinkdb.helpers import chain_to_bytes, decode_utf8
 
 
 @pytest.mark.unit
 class TestDecodeUTF8Helper(object):
-    def test_python2_decode_string(self):
-        string = Mock()
+    def test_decode_bytes(self):
+        decoded_string = decode_utf8("iron man \u2665".encode("utf-8"))
 
-        decoded_string = decode_utf8(string)
+        assert decoded_string == "iron man \u2665"
+
+    def test_decode_bytes_with_encoding(self):
+        decoded_string = decode_utf8(b"iron man \xe9", encoding="latin-1")
 
-        string.decode.assert_called_once_with("utf-8")
+        assert decoded_string == "iron man \xe9"
 
-    def test_python3_decode_string(self):
-        string = Mock(spec=str)
-        delattr(string, "decode")
+    def test_decode_string(self):
+        string = "iron man"
 
         decoded_string = decode_utf8(string)
 
-        assert decoded_string == string
+        assert decoded_string is string
 
 
 @pytest.mark.unit
 class TestChainToBytesHelper(object):
-    def test_string_chaining(self):
-        expected_string = b"iron man"
-
-        result = chain_to_bytes("iron", " ", "man")
-
-        assert result == expected_string
-
-    def test_byte_chaining(self):
-        expected_string = b"iron man"
-
-        result = chain_to_bytes(b"iron", b" ", b"man")
-
-        assert result == expected_string
-
-    def test_mixed_chaining(self):
-        expected_string = b"iron man"
-
-        result = chain_to_bytes("iron", " ", b"man")
-
-        assert result == expected_string
+    @pytest.mark.parametrize(
+        "strings",
+        [("iron", " ", "man"), (b"iron", b" ", b"man"), ("iron", " ", b"man")],
+        ids=["string", "bytes", "mixed"],
+    )
+    def test_chaining(self, strings):
+        result = chain_to_bytes(*strings)
+
+        assert result == b"iron man"
@@ -41,6 +41,26 @@ class TestDriverLogger(object):
 
         mock_stderr.write.assert_has_calls([call(expected_message)])
 
+    def test_log_disabled_level(self):
+        self.driver_logger.write_to_console = False
+
+        with patch.object(self.logger, "isEnabledFor", return_value=False):
+            with patch.object(self.logger, "log") as mock_log:
+                self.driver_logger.debug("debug message")
+
+        assert mock_log.called is False
+
+    @patch("rethinkdb.logger.sys.stdout")
+    def test_log_disabled_level_write_to_console(self, mock_stdout):
+        expected_message = "debug message"
+        self.driver_logger.write_to_console = True
+
+        with patch.object(self.logger, "isEnabledFor", return_value=False):
+            with patch.object(self.logger, "log") as mock_log:
+                self.driver_logger.debug(expected_message)
+
+        mock_stdout.write.assert_called_once_with(expected_message)
+
     def test_log_debug(self):
         expected_message = "debug message"
 
@@ -49,6 +69,22 @@ class TestDriverLogger(object):
 
         mock_log.assert_called_once_with(logging.DEBUG, expected_message)
 
+    def test_log_debug_with_args(self):
+        with patch.object(self.logger, "log") as mock_log:
+            self.driver_logger.debug("debug message %s", 1)
+
+        mock_log.assert_called_once_with(logging.DEBUG, "debug message %s", 1)
+
+    @patch("rethinkdb.logger.sys.stdout")
+    def test_log_write_to_stdout_with_args(self, mock_stdout):
+        self.driver_logger.write_to_console = True
+
+        with patch.object(self.logger, "log") as mock_log:
+            self.driver_logger.info("info message %s", 1)
+
+        mock_stdout.write.assert_called_once_with("info message 1")
+        mock_log.assert_called_once_with(logging.INFO, "info message %s", 1)
+
     def test_log_info(self):
         expected_message = "info message"
 
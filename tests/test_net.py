@@ -1,13 +1,14 @@
 import pytest
-from mock import ANY, Mock
+from mock import ANY, Mock, sentinel
 
+from rethinkdb.handshake import HandshakeV1_0
 from rethinkdb.net import DEFAULT_PORT, DefaultConnection, make_connection
 
 
 @pytest.mark.unit
 class TestMakeConnection(object):
     def setup_method(self):
-        self.reconnect = Mock()
+        self.reconnect = sentinel.connection
         self.conn_type = Mock()
         self.conn_type.return_value.reconnect.return_value = self.reconnect
 
@@ -139,6 +140,32 @@ class TestMakeConnection(object):
             ANY,
         )
 
+    def test_make_connection_falsy_timeout_and_handshake_version(self):
+        conn = make_connection(
+            self.conn_type,
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            auth_key=self.auth_key,
+            user=self.user,
+            password=self.password,
+            timeout=None,
+            _handshake_version=0,
+        )
+
+        assert conn == self.reconnect
+        self.conn_type.assert_called_once_with(
+            self.host,
+            self.port,
+            self.db,
+            self.auth_key,
+            self.user,
+            self.password,
+            20,
+            ANY,
+            10,
+        )
+
     def test_make_connection_with_ssl(self):
         ssl = dict()
 
@@ -192,3 +219,66 @@ class TestMakeConnection(object):
             ANY,
             20,
         )
+
+    def test_make_connection_db_url_without_credentials(self):
+        url = "rethinkdb://myhost/mydb"
+
+        conn = make_connection(self.conn_type, url=url)
+
+        assert conn == self.reconnect
+        self.conn_type.assert_called_once_with(
+            self.host,
+            DEFAULT_PORT,
+            self.db,
+            None,
+            "admin",
+            None,
+            20,
+            ANY,
+            ANY,
+        )
+
+    def test_make_connection_ipv6_db_url(self):
+        url = "rethinkdb://[::1]:1234/mydb"
+
+        conn = make_connection(self.conn_type, url=url)
+
+        assert conn == self.reconnect
+        self.conn_type.assert_called_once_with(
+            "::1", self.port, self.db, None, "admin", None, 20, ANY, ANY
+        )
+
+    def test_make_connection_db_url_percent_encoded_query(self):
+        url = "rethinkdb://myhost:1234/mydb?auth_key=my%20key+1"
+
+        conn = make_connection(self.conn_type, url=url)
+
+        assert conn == self.reconnect
+        self.conn_type.assert_called_once_with(
+            self.host, self.port, self.db, "my key 1", "admin", None, 20, ANY, ANY
+        )
+
+    def test_make_connection_db_url_invalid_port(self):
+        with pytest.raises(ValueError):
+            make_connection(self.conn_type, url="rethinkdb://myhost:abc/mydb")
+
+        assert self.conn_type.called is False
+
+
+@pytest.mark.unit
+class TestConnection(object):
+    def test_handshake_uses_shared_json_encoder_and_decoder(self):
+        conn = DefaultConnection(
+            "localhost",
+            DEFAULT_PORT,
+            None,
+            None,
+            "admin",
+            None,
+            20,
+            dict(),
+            10,
+        )
+
+        assert conn.handshake._json_decoder is HandshakeV1_0.JSON_DECODER
+        assert conn.handshake._json_encoder is HandshakeV1_0.JSON_ENCODER
@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+from mock import sentinel
+
+from rethinkdb.ast import Repl
+
+
+@pytest.mark.unit
+class TestRepl(object):
+    def setup_method(self):
+        Repl.clear()
+
+    def teardown_method(self):
+        Repl.clear()
+
+    def test_get_without_connection(self):
+        assert Repl.get() is None
+
+    def test_set(self):
+        Repl.set(sentinel.connection)
+
+        assert Repl.get() is sentinel.connection
+        assert Repl.repl_active is True
+
+    def test_clear(self):
+        Repl.set(sentinel.connection)
+
+        Repl.clear()
+
+        assert Repl.get() is None
+        assert Repl.repl_active is False
+
+    def test_connection_is_thread_local(self):
+        result = []
+        Repl.set(sentinel.connection)
+
+        thread = threading.Thread(target=lambda: result.append(Repl.get()))
+        thread.start()
+        thread.join()
+
+        assert result == [None]
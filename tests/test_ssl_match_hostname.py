@@ -0,0 +1,51 @@
+import pytest
+from mock import patch
+
+from rethinkdb.backports import ssl_match_hostname
+from rethinkdb.backports.ssl_match_hostname import (
+    CertificateError,
+    _wildcard_pattern,
+    match_hostname,
+)
+
+
+@pytest.mark.unit
+class TestMatchHostname(object):
+    def setup_method(self):
+        self.cert = {"subjectAltName": (("DNS", "*.example.com"),)}
+
+    def test_exact_match(self):
+        cert = {"subjectAltName": (("DNS", "db.example.com"),)}
+
+        match_hostname(cert, "DB.example.com")
+
+    def test_wildcard_match(self):
+        match_hostname(self.cert, "db.example.com")
+
+    def test_wildcard_does_not_match_subdomains(self):
+        with pytest.raises(CertificateError):
+            match_hostname(self.cert, "a.db.example.com")
+
+    def test_too_many_wildcards(self):
+        cert = {"subjectAltName": (("DNS", "*.*.example.com"),)}
+
+        with pytest.raises(CertificateError):
+            match_hostname(cert, "a.b.example.com")
+
+    def test_common_name(self):
+        cert = {"subject": ((("commonName", "*.example.com"),),)}
+
+        match_hostname(cert, "db.example.com")
+
+    def test_wildcard_pattern_is_cached(self):
+        pattern = _wildcard_pattern("*.example.com", False)
+
+        assert _wildcard_pattern("*.example.com", False) is pattern
+
+    @patch.object(ssl_match_hostname, "_MAX_WILDCARD_PATTERNS", 1)
+    @patch.object(ssl_match_hostname, "_wildcard_patterns", {})
+    def test_wildcard_pattern_cache_is_bounded(self):
+        _wildcard_pattern("*.example.com", False)
+        _wildcard_pattern("*.example.org", False)
+
+        assert list(ssl_match_hostname._wildcard_patterns) == [("*.example.org", False)]
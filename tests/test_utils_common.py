@@ -3,8 +3,8 @@ import pytest
 from rethinkdb import utils_common
 
 
-@pytest.fixture
-def parser():
+@pytest.fixture(scope="module")
+def module_parser():
     opt_parser = utils_common.CommonOptionsParser()
     opt_parser.add_option(
         "-e",
@@ -21,54 +21,60 @@ def parser():
     return opt_parser
 
 
-def test_option_parser_int_pos(parser):
-    options, args = parser.parse_args(["--clients", "4"], connect=False)
-
-    assert options.clients == 4
-
-
-def test_option_parser_int_pos_equals(parser):
-    options, args = parser.parse_args(["--clients=4"], connect=False)
-
-    assert options.clients == 4
-
-
-def test_option_parser_int_pos_default(parser):
-    options, args = parser.parse_args([], connect=False)
-
-    assert options.clients == 3
-
-
-def test_option_parser_int_pos_fail(parser):
-    with pytest.raises(SystemExit):
-        parser.parse_args(["--clients=asdf"], connect=False)
-
-
-def test_option_parser_int_pos_zero(parser):
-    with pytest.raises(SystemExit):
-        parser.parse_args(["--clients=0"], connect=False)
-
-
-def test_option_parser_db_table(parser):
-    options, args = parser.parse_args(["--export=example.table"], connect=False)
-
-    assert options.db_tables == [("example", "table")]
-
-
-def test_option_parser_db_table_append(parser):
-    options, args = parser.parse_args(
-        ["--export=example.table", "--export=example.another"], connect=False
-    )
-
-    assert options.db_tables == [("example", "table"), ("example", "another")]
-
-
-def test_option_parser_db_table_only_db(parser):
-    options, args = parser.parse_args(["--export=example"], connect=False)
-
-    assert options.db_tables == [("example", None)]
-
-
-def test_option_parser_db_table_fail(parser):
+@pytest.fixture
+def parser(module_parser):
+    # The append action extends the default list in place, so it is reset for
+    # every test sharing the parser
+    module_parser.set_default("db_tables", [])
+    return module_parser
+
+
+@pytest.mark.parametrize(
+    "argv,dest,expected",
+    [
+        (["--clients", "4"], "clients", 4),
+        (["--clients=4"], "clients", 4),
+        ([], "clients", 3),
+        (["--export=example.table"], "db_tables", [("example", "table")]),
+        (
+            ["--export=example.table", "--export=example.another"],
+            "db_tables",
+            [("example", "table"), ("example", "another")],
+        ),
+        (["--export=example"], "db_tables", [("example", None)]),
+    ],
+    ids=[
+        "int_pos",
+        "int_pos_equals",
+        "int_pos_default",
+        "db_table",
+        "db_table_append",
+        "db_table_only_db",
+    ],
+)
+def test_option_parser(parser, argv, dest, expected):
+    options, args = parser.parse_args(argv, connect=False)
+
+    assert getattr(options, dest) == expected
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--clients=asdf"],
+        ["--clients=0"],
+        ["--clients=-4"],
+        ["--export="],
+        ["--export=rethinkdb.table"],
+    ],
+    ids=[
+        "int_pos_fail",
+        "int_pos_zero",
+        "int_pos_negative",
+        "db_table_fail",
+        "db_table_rethinkdb_fail",
+    ],
+)
+def test_option_parser_fail(parser, argv):
     with pytest.raises(SystemExit):
-        parser.parse_args(["--export="], connect=False)
+        parser.parse_args(argv, connect=False)